@@ -19,6 +19,11 @@ SLACK_SIGNING_SECRET (Required): Signing secret for HTTP mode webhook verificati
 GOOGLE_API_KEY      (Required): Google API key for Gemini API access
 DISCOUNT_CODE       (Optional): The secret discount code to guard (default: 4b0daf70118becc1)
 DISCOUNT_CODES      (Optional): Comma-separated list of discount codes; if provided this overrides DISCOUNT_CODE
+SLACK_WORKSPACES_PATH (Optional): JSON installation file keyed by team_id; enables multi-workspace mode
+WORKSPACE_IDLE_SECONDS (Optional): Drop a workspace's in-memory state after this long idle (default: 3600)
+CHANNEL_STATE_MAX   (Optional): Max channels tracked per workspace before LRU eviction (default: 10000)
+CHANNEL_STATE_IDLE_SECONDS (Optional): Forget a channel's attempts after this long idle (default: 604800)
+CHANNEL_STATE_SNAPSHOT_SECONDS (Optional): How often changed channel state is written to disk (default: 30)
 
 System Prompt:
 The system prompt is defined in prompt.py and uses the DISCOUNT_CODE environment variable.
@@ -28,15 +33,17 @@ import os
 import re
 import json
 import logging
+import atexit
 import asyncio
 from pathlib import Path
-from collections import defaultdict
 from google import genai
 from google.genai import types
 from slack_bolt.async_app import AsyncApp
-from slack_sdk.web.async_client import AsyncWebClient
+from slack_bolt.authorization.async_authorize import AsyncInstallationStoreAuthorize
 from dotenv import load_dotenv
 from prompt import get_system_prompt
+from channel_state import ChannelStateStore
+from workspaces import Workspace, WorkspaceInstallationStore, WorkspaceRegistry
 
 # Load environment variables from .env file
 load_dotenv()
@@ -48,20 +55,26 @@ logging.basicConfig(
     handlers=[logging.StreamHandler()]
 )
 logger = logging.getLogger(__name__)
-# Track attempts and dynamic easy-mode thresholds per channel (start at 30, then +20 after a real code is given)
-CHANNEL_STATE = defaultdict(lambda: {"attempts": 0, "interval": 20, "next_threshold": 20})
-# Track discount code inventory in memory (persisted to disk between restarts)
-inventory_lock = asyncio.Lock()
-STATE_PATH = Path(__file__).parent / "state" / "discount_codes.json"
+# Attempt state and discount code inventory live on a Workspace per team (see workspaces.py)
+STATE_DIR = Path(__file__).parent / "state"
+STATE_PATH = STATE_DIR / "discount_codes.json"
+CHANNEL_STATE_FILENAME = "channel_state.json"
 
 # Get environment variables
 SLACK_BOT_TOKEN = os.environ.get("SLACK_BOT_TOKEN")
 SLACK_APP_TOKEN = os.environ.get("SLACK_APP_TOKEN")
 SHOULD_REPLY_IN_CHANNEL = os.environ.get("SHOULD_REPLY_IN_CHANNEL", "true").lower() == "true"
+SLACK_WORKSPACES_PATH = os.environ.get("SLACK_WORKSPACES_PATH")
+WORKSPACE_IDLE_SECONDS = float(os.environ.get("WORKSPACE_IDLE_SECONDS", 3600))
+WORKSPACE_SWEEP_SECONDS = min(WORKSPACE_IDLE_SECONDS, 60)
+MULTI_WORKSPACE = bool(SLACK_WORKSPACES_PATH)
+CHANNEL_STATE_MAX = int(os.environ.get("CHANNEL_STATE_MAX", 10000))
+CHANNEL_STATE_IDLE_SECONDS = float(os.environ.get("CHANNEL_STATE_IDLE_SECONDS", 7 * 24 * 3600))
+CHANNEL_STATE_SNAPSHOT_SECONDS = float(os.environ.get("CHANNEL_STATE_SNAPSHOT_SECONDS", 30))
 
 # Check for required environment variables
-if not SLACK_BOT_TOKEN:
-    raise ValueError("SLACK_BOT_TOKEN environment variable is required")
+if not SLACK_BOT_TOKEN and not MULTI_WORKSPACE:
+    raise ValueError("SLACK_BOT_TOKEN environment variable is required (or set SLACK_WORKSPACES_PATH)")
 
 SLACK_SIGNING_SECRET = os.environ.get("SLACK_SIGNING_SECRET")
 if not SLACK_SIGNING_SECRET:
@@ -113,41 +126,46 @@ def parse_discount_codes() -> list[str]:
         if value:
             codes.append(extract_discount_code(value))
 
-    # Preserve order but remove duplicates
+    unique_codes = unique_discount_codes(codes)
+    # In multi-workspace mode every team may list its own codes instead
+    if not unique_codes and not MULTI_WORKSPACE:
+        raise ValueError("No valid discount codes configured; please set DISCOUNT_CODES or DISCOUNT_CODE_*")
+    return unique_codes
+
+def unique_discount_codes(codes) -> list[str]:
+    """Preserve order but remove duplicates, blanks and deprecated codes."""
     seen = set()
     unique_codes = []
     for code in codes:
         if code and code not in DEPRECATED_CODES and code not in seen:
             seen.add(code)
             unique_codes.append(code)
-    if not unique_codes:
-        raise ValueError("No valid discount codes configured; please set DISCOUNT_CODES or DISCOUNT_CODE_*")
     return unique_codes
 
 DISCOUNT_CODES = parse_discount_codes()
 
-def ensure_state_dir():
-    STATE_PATH.parent.mkdir(parents=True, exist_ok=True)
+def ensure_state_dir(state_path: Path = STATE_PATH):
+    state_path.parent.mkdir(parents=True, exist_ok=True)
 
-def load_code_state() -> dict:
-    """Load discount code state from disk; if missing, seed from env codes."""
-    ensure_state_dir()
-    if STATE_PATH.exists():
+def load_code_state(state_path: Path = STATE_PATH, discount_codes: list[str] = DISCOUNT_CODES) -> dict:
+    """Load discount code state from disk; if missing, seed from the configured codes."""
+    ensure_state_dir(state_path)
+    if state_path.exists():
         try:
-            with STATE_PATH.open("r", encoding="utf-8") as f:
+            with state_path.open("r", encoding="utf-8") as f:
                 data = json.load(f)
                 available = [
                     c for c in data.get("available_codes", [])
-                    if c not in DEPRECATED_CODES and c in DISCOUNT_CODES
+                    if c not in DEPRECATED_CODES and c in discount_codes
                 ]
                 used = [
                     c for c in data.get("used_codes", [])
-                    if c not in DEPRECATED_CODES and c in DISCOUNT_CODES
+                    if c not in DEPRECATED_CODES and c in discount_codes
                 ]
                 last_given = data.get("last_given_code")
                 # If new codes are added via env, append them to available if not already tracked
                 known_codes = set(available + used)
-                for code in DISCOUNT_CODES:
+                for code in discount_codes:
                     if code not in known_codes:
                         available.append(code)
                 return {
@@ -158,21 +176,114 @@ def load_code_state() -> dict:
         except Exception as error:
             logger.warning(f"Could not load code state, re-seeding from env: {error}")
     return {
-        "available_codes": DISCOUNT_CODES.copy(),
+        "available_codes": list(discount_codes),
         "used_codes": [],
         "last_given_code": None,
     }
 
-def save_code_state(state: dict) -> None:
-    ensure_state_dir()
-    with STATE_PATH.open("w", encoding="utf-8") as f:
+def save_code_state(state: dict, state_path: Path = STATE_PATH) -> None:
+    ensure_state_dir(state_path)
+    with state_path.open("w", encoding="utf-8") as f:
         json.dump(state, f, indent=2)
 
-code_state = load_code_state()
+def team_state_dir(team_id: str) -> Path:
+    """Per-team state directory, e.g. state/T0123/."""
+    safe_team_id = re.sub(r"[^A-Za-z0-9_-]", "_", team_id)
+    return STATE_DIR / safe_team_id
+
+def load_channel_state(state_dir: Path) -> ChannelStateStore:
+    """Restore per-channel attempt state stored in a state directory."""
+    return ChannelStateStore(
+        state_dir / CHANNEL_STATE_FILENAME,
+        max_channels=CHANNEL_STATE_MAX,
+        idle_seconds=CHANNEL_STATE_IDLE_SECONDS,
+        snapshot_seconds=CHANNEL_STATE_SNAPSHOT_SECONDS,
+    )
+
+installation_store = WorkspaceInstallationStore(Path(SLACK_WORKSPACES_PATH)) if MULTI_WORKSPACE else None
+
+# The env codes are one-time-use, so every team without its own codes draws from this
+# single inventory (the same state/discount_codes.json used in single-workspace mode)
+shared_code_state = load_code_state()
+shared_inventory_lock = asyncio.Lock()
+
+def load_workspace(team_id: str) -> Workspace:
+    """Build a team's Workspace from its own codes and inventory, or the shared env inventory."""
+    state_dir = team_state_dir(team_id)
+    team_codes = installation_store.discount_codes(team_id)
+    if team_codes is not None:
+        # Team codes accept the same formats as the env vars (full URLs, query fragments, raw codes)
+        team_codes = unique_discount_codes(extract_discount_code(str(code)) for code in team_codes)
+        if not team_codes:
+            logger.warning(f"Team {team_id} lists no valid discount codes; using the shared env codes")
+            team_codes = None
+    if team_codes is None:
+        return Workspace(
+            team_id,
+            DISCOUNT_CODES,
+            shared_code_state,
+            STATE_PATH,
+            load_channel_state(state_dir),
+            inventory_lock=shared_inventory_lock,
+        )
+    state_path = state_dir / STATE_PATH.name
+    return Workspace(
+        team_id,
+        team_codes,
+        load_code_state(state_path, team_codes),
+        state_path,
+        load_channel_state(state_dir),
+    )
+
+if MULTI_WORKSPACE:
+    default_workspace = None
+    workspace_registry = WorkspaceRegistry(load_workspace, WORKSPACE_IDLE_SECONDS)
+else:
+    default_workspace = Workspace(
+        None, DISCOUNT_CODES, shared_code_state, STATE_PATH, load_channel_state(STATE_DIR),
+        inventory_lock=shared_inventory_lock,
+    )
+    workspace_registry = None
+
+def get_workspace(team_id: str | None) -> Workspace:
+    if workspace_registry is None:
+        return default_workspace
+    return workspace_registry.get(team_id or "")
+
+def snapshot_channel_state() -> None:
+    """Flush every loaded workspace's channel state to disk."""
+    if workspace_registry is None:
+        default_workspace.channel_state.snapshot()
+    else:
+        workspace_registry.snapshot_all()
+
+# Flush on interpreter exit however the app was started
+atexit.register(snapshot_channel_state)
+maintenance_task: asyncio.Task | None = None
+
+async def maintain_state_periodically() -> None:
+    """Write changed channel state and drop idle workspaces on a timer, even when no one is mentioning the bot."""
+    while True:
+        await asyncio.sleep(min(CHANNEL_STATE_SNAPSHOT_SECONDS, WORKSPACE_SWEEP_SECONDS))
+        snapshot_channel_state()
+        if workspace_registry is not None:
+            workspace_registry.evict_idle()
+
+def ensure_maintenance_task() -> None:
+    """Start the maintenance task on the running event loop (Bolt owns the loop, so start lazily)."""
+    global maintenance_task
+    if maintenance_task is None or maintenance_task.done():
+        maintenance_task = asyncio.get_running_loop().create_task(maintain_state_periodically())
 
 # Log startup configuration
 logger.info("=== SLACK BOT STARTUP ===")
-logger.info(f"Bot Token: {SLACK_BOT_TOKEN[:12]}..." if SLACK_BOT_TOKEN else "No Bot Token")
+if MULTI_WORKSPACE:
+    logger.info(
+        f"Multi-workspace mode: {len(installation_store.team_ids())} team(s) from {SLACK_WORKSPACES_PATH} "
+        f"(idle eviction after {WORKSPACE_IDLE_SECONDS:.0f}s)"
+    )
+else:
+    logger.info(f"Bot Token: {SLACK_BOT_TOKEN[:12]}..." if SLACK_BOT_TOKEN else "No Bot Token")
 logger.info(f"Signing Secret: {SLACK_SIGNING_SECRET[:12]}..." if SLACK_SIGNING_SECRET else "No Signing Secret")
 logger.info(f"Google API Key: {GOOGLE_API_KEY[:12]}..." if GOOGLE_API_KEY else "No Google API Key")
 logger.info(f"Discount codes (total {len(DISCOUNT_CODES)}): {', '.join(DISCOUNT_CODES)}")
@@ -181,11 +292,23 @@ logger.info("==========================")
 # Initialize Google Gemini client
 client = genai.Client(api_key=GOOGLE_API_KEY)
 
-app = AsyncApp(
-    token=SLACK_BOT_TOKEN,
-    signing_secret=SLACK_SIGNING_SECRET
-)
-async_client = AsyncWebClient(token=SLACK_BOT_TOKEN)
+if MULTI_WORKSPACE:
+    # Tokens are resolved per incoming event's team_id from the installation store;
+    # caching keeps Bolt's auth.test to once per token instead of once per event
+    app = AsyncApp(
+        signing_secret=SLACK_SIGNING_SECRET,
+        authorize=AsyncInstallationStoreAuthorize(
+            logger=logger,
+            installation_store=installation_store,
+            bot_only=True,
+            cache_enabled=True,
+        ),
+    )
+else:
+    app = AsyncApp(
+        token=SLACK_BOT_TOKEN,
+        signing_secret=SLACK_SIGNING_SECRET
+    )
 
 async def call_llm(prompt: str, system_prompt: str) -> str:
     """Call the Google Gemini API using native genai client"""
@@ -218,7 +341,7 @@ async def call_llm(prompt: str, system_prompt: str) -> str:
 
 # Listen for mentions (when someone tags the bot)
 @app.event("app_mention")
-async def handle_mention(event, say, client):
+async def handle_mention(event, say, client, context):
     """Handle when the bot is mentioned with @botname"""
     
     # Extract event details
@@ -226,10 +349,14 @@ async def handle_mention(event, say, client):
     channel_id = event.get('channel')
     user_id = event.get('user')
     original_text = event.get('text', '')
+    team_id = context.team_id or event.get('team')
+    workspace = None
+    ensure_maintenance_task()
     
     # Get user information
     try:
-        user_info = await async_client.users_info(user=user_id)
+        # Bolt injects a client authorized for the event's team
+        user_info = await client.users_info(user=user_id)
         username = user_info['user']['name']
         display_name = user_info['user'].get('profile', {}).get('display_name', username)
         real_name = user_info['user'].get('profile', {}).get('real_name', username)
@@ -242,6 +369,7 @@ async def handle_mention(event, say, client):
     # Log detailed mention information
     logger.info("=== BOT MENTION RECEIVED ===")
     logger.info(f"Message ID: {message_ts}")
+    logger.info(f"Team ID: {team_id}")
     logger.info(f"Channel ID: {channel_id}")
     logger.info(f"User ID: {user_id}")
     logger.info(f"Username: @{username}")
@@ -251,6 +379,9 @@ async def handle_mention(event, say, client):
     logger.info("=============================")
     
     try:
+        workspace = get_workspace(team_id)
+        code_state = workspace.code_state
+
         # Remove the bot mention from the text
         # The mention format is usually <@U1234567890> so we need to clean it
         cleaned_text = re.sub(r'<@[^>]+>\s*', '', original_text).strip()
@@ -259,11 +390,11 @@ async def handle_mention(event, say, client):
         
         if cleaned_text:
             # Count attempts per channel and decide if this is an easy round
-            state = CHANNEL_STATE[channel_id]
-            state["attempts"] += 1
-            attempts = state["attempts"]
-            interval = state["interval"]
-            next_threshold = state["next_threshold"]
+            state = workspace.channel_state[channel_id]
+            state.attempts += 1
+            attempts = state.attempts
+            interval = state.interval
+            next_threshold = state.next_threshold
             is_easy_round = attempts >= next_threshold
             logger.info(
                 f"Channel {channel_id} has {attempts} attempts. "
@@ -300,12 +431,12 @@ async def handle_mention(event, say, client):
 
             # Issue a real code only during easy mode and only if user is clearly asking
             if is_easy_round and is_code_request:
-                async with inventory_lock:
+                async with workspace.inventory_lock:
                     if code_state["available_codes"]:
                         issued_code = code_state["available_codes"].pop(0)
                         code_state["used_codes"].append(issued_code)
                         code_state["last_given_code"] = issued_code
-                        save_code_state(code_state)
+                        save_code_state(code_state, workspace.state_path)
                         available_count = len(code_state["available_codes"])
                         used_count = len(code_state["used_codes"])
                         total_count = available_count + used_count
@@ -330,14 +461,14 @@ async def handle_mention(event, say, client):
             if is_easy_round:
                 # After any easy round, schedule the next threshold; extend interval if a real code was given
                 if issued_real_code:
-                    state["interval"] += 20
-                state["next_threshold"] = attempts + state["interval"]
+                    state.interval += 20
+                state.next_threshold = attempts + state.interval
 
             giveaway_code = (
                 code_state["available_codes"][0] if is_easy_round and code_state["available_codes"] else None
             )
             system_prompt = get_system_prompt(
-                discount_codes=DISCOUNT_CODES,
+                discount_codes=workspace.discount_codes,
                 available_count=available_count,
                 used_count=used_count,
                 is_easy_round=is_easy_round,
@@ -363,6 +494,10 @@ async def handle_mention(event, say, client):
     except Exception as error:
         logger.error(f'Error processing mention: {error}')
         await say('Sorry, I encountered an error processing your message.')
+    finally:
+        # Persist this mention's state change once the snapshot interval has passed
+        if workspace is not None:
+            workspace.channel_state.maybe_snapshot()
 
 # Start the app
 if __name__ == "__main__":
@@ -378,4 +513,4 @@ if __name__ == "__main__":
     except KeyboardInterrupt:
         logger.info("👋 Bot stopped by user")
     except Exception as e:
-        logger.error(f"❌ Bot crashed: {e}") 
+        logger.error(f"❌ Bot crashed: {e}")
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+Bounded per-channel attempt state for the Slack bot.
+Records are kept in an LRU map capped at max_channels, dropped after idle_seconds
+without a mention, and persisted as a compact snapshot plus an append-only journal
+of changed channels so a restart restores everyone's easy-round thresholds.
+"""
+
+import os
+import json
+import time
+import logging
+from pathlib import Path
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ChannelRecord:
+    """Attempt counters for one channel (start at 20, then +20 after a real code is given)."""
+
+    __slots__ = ("attempts", "interval", "next_threshold", "last_seen")
+
+    def __init__(self, attempts: int = 0, interval: int = 20, next_threshold: int = 20, last_seen: float = 0.0):
+        self.attempts = attempts
+        self.interval = interval
+        self.next_threshold = next_threshold
+        self.last_seen = last_seen
+
+    def to_row(self, channel_id: str) -> list:
+        return [channel_id, self.attempts, self.interval, self.next_threshold, round(self.last_seen, 3)]
+
+
+class ChannelStateStore:
+    """
+    LRU map of channel_id -> ChannelRecord backed by two files next to each other:
+
+        channel_state.json     full snapshot, rewritten atomically on compaction
+        channel_state.journal  one JSON row per changed channel, [channel_id] for an eviction
+
+    maybe_snapshot() appends only the channels touched since the last call and
+    compacts the journal into the snapshot once it outgrows the live record count.
+    """
+
+    def __init__(
+        self,
+        snapshot_path: Optional[Path],
+        max_channels: int = 10000,
+        idle_seconds: float = 7 * 24 * 3600,
+        snapshot_seconds: float = 30,
+    ):
+        self.snapshot_path = snapshot_path
+        self.journal_path = snapshot_path.with_suffix(".journal") if snapshot_path else None
+        self.max_channels = max(1, max_channels)
+        self.idle_seconds = idle_seconds
+        self.snapshot_seconds = snapshot_seconds
+        self._records: OrderedDict[str, ChannelRecord] = OrderedDict()
+        self._dirty: set[str] = set()
+        self._evicted: set[str] = set()
+        self._journal_rows = 0
+        self._last_snapshot = time.monotonic()
+        self.restore()
+
+    def __getitem__(self, channel_id: str) -> ChannelRecord:
+        now = time.time()
+        record = self._records.get(channel_id)
+        if record is None:
+            record = ChannelRecord()
+            self._records[channel_id] = record
+            self._evicted.discard(channel_id)
+        else:
+            self._records.move_to_end(channel_id)
+        record.last_seen = now
+        # Callers mutate the record they get back, so every access counts as a change
+        self._dirty.add(channel_id)
+        self.evict(now)
+        return record
+
+    def __contains__(self, channel_id: str) -> bool:
+        return channel_id in self._records
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def evict(self, now: Optional[float] = None) -> None:
+        """Drop least-recently-used records over capacity and records idle past idle_seconds."""
+        now = time.time() if now is None else now
+        while len(self._records) > self.max_channels:
+            channel_id, _ = self._records.popitem(last=False)
+            self._forget(channel_id)
+        # Records are in LRU order, so the idle ones are all at the front
+        while self._records:
+            channel_id, record = next(iter(self._records.items()))
+            if now - record.last_seen <= self.idle_seconds:
+                break
+            del self._records[channel_id]
+            self._forget(channel_id)
+
+    def _forget(self, channel_id: str) -> None:
+        self._dirty.discard(channel_id)
+        self._evicted.add(channel_id)
+
+    def restore(self) -> None:
+        """Load the snapshot, replay the journal, then apply the current bounds."""
+        if self.snapshot_path is None:
+            return
+        rows: dict[str, list] = {}
+        rewrite = False
+        skipped = 0
+        if self.snapshot_path.exists():
+            try:
+                with self.snapshot_path.open("r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if not isinstance(data, dict) or not isinstance(data.get("channels", []), list):
+                    raise ValueError("expected an object with a 'channels' list")
+                for row in data.get("channels", []):
+                    if self._valid_row(row) and len(row) == 5:
+                        rows[row[0]] = row
+                    else:
+                        skipped += 1
+            except Exception as error:
+                # Keep the bad file for inspection; the journal is still replayed on its own
+                bad_path = self.snapshot_path.with_name(self.snapshot_path.name + ".bad")
+                logger.warning(f"Could not read channel state snapshot {self.snapshot_path}, moving it to {bad_path}: {error}")
+                rows = {}
+                rewrite = True
+                try:
+                    os.replace(self.snapshot_path, bad_path)
+                except OSError as move_error:
+                    logger.error(f"Could not move aside {self.snapshot_path}: {move_error}")
+        if self.journal_path.exists():
+            try:
+                with self.journal_path.open("r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            row = json.loads(line)
+                        except json.JSONDecodeError:
+                            # A torn final line from a crash mid-append; everything before it is valid
+                            rewrite = True
+                            break
+                        self._journal_rows += 1
+                        if not self._valid_row(row):
+                            skipped += 1
+                        elif len(row) == 1:
+                            rows.pop(row[0], None)
+                        else:
+                            rows[row[0]] = row
+            except OSError as error:
+                logger.warning(f"Could not read channel state journal {self.journal_path}: {error}")
+        if skipped:
+            logger.warning(f"Skipped {skipped} malformed channel state row(s) in {self.snapshot_path}")
+        for channel_id, attempts, interval, next_threshold, last_seen in sorted(rows.values(), key=lambda r: r[4]):
+            self._records[channel_id] = ChannelRecord(attempts, interval, next_threshold, float(last_seen))
+        self.evict()
+        self._evicted.clear()
+        if rewrite:
+            # Fold everything recovered into a clean snapshot so the next restart reads good files
+            try:
+                self._compact()
+            except OSError as error:
+                logger.error(f"Could not rewrite channel state snapshot {self.snapshot_path}: {error}")
+        if self._records:
+            logger.info(f"Restored state for {len(self._records)} channel(s) from {self.snapshot_path}")
+
+    @staticmethod
+    def _valid_row(row) -> bool:
+        """A row is [channel_id] (eviction) or [channel_id, attempts, interval, next_threshold, last_seen]."""
+        if not isinstance(row, list) or len(row) not in (1, 5) or not isinstance(row[0], str):
+            return False
+        if len(row) == 1:
+            return True
+        counters_ok = all(isinstance(v, int) and not isinstance(v, bool) for v in row[1:4])
+        return counters_ok and isinstance(row[4], (int, float)) and not isinstance(row[4], bool)
+
+    def maybe_snapshot(self) -> None:
+        """Persist changes if snapshot_seconds have passed since the last snapshot."""
+        if time.monotonic() - self._last_snapshot >= self.snapshot_seconds:
+            self.snapshot()
+
+    def snapshot(self) -> bool:
+        """
+        Append changed and evicted channels to the journal, compacting when it grows too long.
+        Returns True when nothing is left unsaved.
+        """
+        self._last_snapshot = time.monotonic()
+        if not (self._dirty or self._evicted):
+            return True
+        if self.snapshot_path is None:
+            return not self._records
+        try:
+            self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+            if self._journal_rows + len(self._dirty) + len(self._evicted) > max(1000, 2 * len(self._records)):
+                self._compact()
+            else:
+                lines = [json.dumps([channel_id]) for channel_id in self._evicted]
+                lines += [json.dumps(self._records[c].to_row(c)) for c in self._dirty if c in self._records]
+                with self.journal_path.open("a", encoding="utf-8") as f:
+                    f.write("\n".join(lines) + "\n")
+                self._journal_rows += len(lines)
+            self._dirty.clear()
+            self._evicted.clear()
+            return True
+        except Exception as error:
+            logger.error(f"Could not snapshot channel state to {self.snapshot_path}: {error}")
+            return False
+
+    def _compact(self) -> None:
+        self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.snapshot_path.with_suffix(".tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            json.dump({"channels": [r.to_row(c) for c, r in self._records.items()]}, f, separators=(",", ":"))
+        os.replace(tmp_path, self.snapshot_path)
+        self.journal_path.unlink(missing_ok=True)
+        self._journal_rows = 0
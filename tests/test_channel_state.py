@@ -0,0 +1,137 @@
+import json
+import time
+import tempfile
+import unittest
+from pathlib import Path
+
+from channel_state import ChannelStateStore
+
+
+class ChannelStateStoreTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self._tmp.name)
+        self.snapshot_path = self.dir / "channel_state.json"
+        self.journal_path = self.dir / "channel_state.journal"
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def store(self, **kwargs) -> ChannelStateStore:
+        return ChannelStateStore(self.snapshot_path, **kwargs)
+
+    def attempts(self, store: ChannelStateStore) -> dict:
+        return {channel_id: record.attempts for channel_id, record in store._records.items()}
+
+    def test_restore_replays_journal_after_restart(self):
+        store = self.store()
+        store["C1"].attempts += 3
+        record = store["C2"]
+        record.attempts += 1
+        record.next_threshold = 40
+        store.snapshot()
+
+        restored = self.store()
+        self.assertEqual(self.attempts(restored), {"C1": 3, "C2": 1})
+        self.assertEqual(restored._records["C2"].next_threshold, 40)
+
+    def test_only_changed_channels_are_journaled(self):
+        store = self.store()
+        store["C1"].attempts += 1
+        store["C2"].attempts += 1
+        store.snapshot()
+        store["C2"].attempts += 1
+        store.snapshot()
+        store.snapshot()
+
+        rows = [json.loads(line) for line in self.journal_path.read_text().splitlines()]
+        self.assertEqual(sorted(row[0] for row in rows[:2]), ["C1", "C2"])
+        self.assertEqual([row[0] for row in rows[2:]], ["C2"])
+
+    def test_torn_journal_line_is_dropped_and_compacted(self):
+        store = self.store()
+        store["C1"].attempts += 2
+        store.snapshot()
+        with self.journal_path.open("a", encoding="utf-8") as f:
+            f.write('["C2", 1, 20')
+
+        restored = self.store()
+        self.assertEqual(self.attempts(restored), {"C1": 2})
+        self.assertFalse(self.journal_path.exists())
+
+        restored["C3"].attempts += 1
+        restored.snapshot()
+        self.assertEqual(self.attempts(self.store()), {"C1": 2, "C3": 1})
+
+    def test_malformed_rows_are_skipped(self):
+        now = time.time()
+        self.snapshot_path.write_text(json.dumps({"channels": [["A", 1, 2], ["B", 3, 20, 23, now]]}))
+        self.journal_path.write_text(f'5\n["C", 1, 20, 20, {now}]\n["D", "x", 1, 1, 1]\n')
+
+        self.assertEqual(self.attempts(self.store()), {"B": 3, "C": 1})
+
+    def test_corrupt_snapshot_is_moved_aside_and_journal_still_replayed(self):
+        now = time.time()
+        self.snapshot_path.write_text("[1, 2")
+        self.journal_path.write_text(f'["C1", 4, 20, 20, {now}]\n')
+
+        restored = self.store()
+        self.assertEqual(self.attempts(restored), {"C1": 4})
+        self.assertTrue((self.dir / "channel_state.json.bad").exists())
+        self.assertFalse(self.journal_path.exists())
+
+        restored["C2"].attempts += 1
+        restored.snapshot()
+        self.assertEqual(self.attempts(self.store()), {"C1": 4, "C2": 1})
+
+    def test_snapshot_that_is_not_an_object_is_treated_as_corrupt(self):
+        self.snapshot_path.write_text("[]")
+        store = self.store()
+        store["C1"].attempts += 1
+        store.snapshot()
+
+        self.assertEqual(self.attempts(self.store()), {"C1": 1})
+
+    def test_compaction_folds_journal_into_snapshot(self):
+        store = self.store()
+        for _ in range(1001):
+            store["C1"].attempts += 1
+            store["C2"].attempts += 1
+            store.snapshot()
+        self.assertLessEqual(store._journal_rows, 1000)
+
+        data = json.loads(self.snapshot_path.read_text())
+        self.assertEqual(sorted(row[0] for row in data["channels"]), ["C1", "C2"])
+        self.assertEqual(self.attempts(self.store()), {"C1": 1001, "C2": 1001})
+
+    def test_lru_eviction_is_persisted(self):
+        store = self.store(max_channels=2)
+        store["C1"].attempts += 1
+        store["C2"].attempts += 1
+        store["C1"].attempts += 1
+        store["C3"].attempts += 1
+        self.assertEqual(list(store._records), ["C1", "C3"])
+        store.snapshot()
+
+        self.assertEqual(self.attempts(self.store(max_channels=2)), {"C1": 2, "C3": 1})
+
+    def test_idle_channels_expire(self):
+        store = self.store(idle_seconds=60)
+        store["C1"].attempts += 1
+        store["C2"].attempts += 1
+        store._records["C1"].last_seen -= 120
+        store.evict()
+        self.assertNotIn("C1", store)
+        store.snapshot()
+
+        self.assertEqual(self.attempts(self.store(idle_seconds=60)), {"C2": 1})
+
+    def test_snapshot_reports_unsaved_state(self):
+        store = ChannelStateStore(None)
+        self.assertTrue(store.snapshot())
+        store["C1"].attempts += 1
+        self.assertFalse(store.snapshot())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+Multi-workspace support for the Slack bot.
+This module contains the installation store and the registry that partitions
+attempt state and code inventories by team_id.
+"""
+
+import json
+import time
+import asyncio
+import logging
+from pathlib import Path
+from typing import Callable, Optional
+
+from slack_sdk.oauth.installation_store import Bot, Installation
+from slack_sdk.oauth.installation_store.async_installation_store import AsyncInstallationStore
+
+from channel_state import ChannelStateStore
+
+logger = logging.getLogger(__name__)
+
+
+class WorkspaceInstallationStore(AsyncInstallationStore):
+    """
+    Installation store backed by a single JSON file keyed by team_id:
+
+        {"T0123": {"bot_token": "xoxb-...", "discount_codes": ["abc", "def"]}}
+
+    Only bot installations are supported. Lookups are served from memory without
+    calling the Slack API; pair the store with a caching AsyncInstallationStoreAuthorize
+    so Bolt's own auth.test runs once per token rather than on every event.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = asyncio.Lock()
+        self._teams: dict[str, dict] = self._load()
+
+    @property
+    def logger(self) -> logging.Logger:
+        return logger
+
+    def _load(self) -> dict[str, dict]:
+        if not self.path.exists():
+            logger.warning(f"Workspace file {self.path} not found; starting with no workspaces")
+            return {}
+        with self.path.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+        return {
+            team_id: entry for team_id, entry in data.items()
+            if isinstance(entry, dict) and entry.get("bot_token")
+        }
+
+    def _save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("w", encoding="utf-8") as f:
+            json.dump(self._teams, f, indent=2)
+
+    def team_ids(self) -> list[str]:
+        return list(self._teams)
+
+    def discount_codes(self, team_id: Optional[str]) -> Optional[list[str]]:
+        """Team-specific discount codes as configured (not yet normalized), or None to fall back to the env codes."""
+        entry = self._teams.get(team_id or "")
+        codes = entry.get("discount_codes") if entry else None
+        return list(codes) if codes else None
+
+    async def async_save(self, installation: Installation):
+        async with self._lock:
+            entry = self._teams.setdefault(installation.team_id, {})
+            entry["bot_token"] = installation.bot_token
+            entry["bot_id"] = installation.bot_id
+            entry["bot_user_id"] = installation.bot_user_id
+            self._save()
+
+    async def async_find_bot(
+        self,
+        *,
+        enterprise_id: Optional[str],
+        team_id: Optional[str],
+        is_enterprise_install: Optional[bool] = False,
+    ) -> Optional[Bot]:
+        entry = self._teams.get(team_id or "")
+        if not entry:
+            logger.warning(f"No installation found for team {team_id}")
+            return None
+        return Bot(
+            app_id=None,
+            enterprise_id=enterprise_id,
+            team_id=team_id,
+            bot_token=entry["bot_token"],
+            bot_id=entry.get("bot_id"),
+            bot_user_id=entry.get("bot_user_id"),
+            installed_at=time.time(),
+        )
+
+
+class Workspace:
+    """
+    Attempt state and discount code inventory for a single team. Teams that use the
+    env codes are given the same code_state and inventory_lock so no code is issued twice.
+    """
+
+    def __init__(
+        self,
+        team_id: Optional[str],
+        discount_codes: list[str],
+        code_state: dict,
+        state_path: Path,
+        channel_state: ChannelStateStore,
+        inventory_lock: Optional[asyncio.Lock] = None,
+    ):
+        self.team_id = team_id
+        self.discount_codes = discount_codes
+        self.code_state = code_state
+        self.state_path = state_path
+        self.channel_state = channel_state
+        self.inventory_lock = inventory_lock or asyncio.Lock()
+        self.last_seen = time.monotonic()
+
+
+class WorkspaceRegistry:
+    """
+    Lazily loads a Workspace per team_id and drops workspaces that have been idle
+    longer than idle_seconds. Inventories are saved on every change and a workspace is
+    only evicted once its channel state has been written to disk, so an evicted workspace
+    is reloaded unchanged the next time its team mentions the bot.
+    """
+
+    def __init__(self, factory: Callable[[str], Workspace], idle_seconds: float):
+        self.factory = factory
+        self.idle_seconds = idle_seconds
+        self._workspaces: dict[str, Workspace] = {}
+        self._last_sweep = time.monotonic()
+
+    def get(self, team_id: str) -> Workspace:
+        now = time.monotonic()
+        if now - self._last_sweep >= min(self.idle_seconds, 60):
+            self.evict_idle(now)
+        workspace = self._workspaces.get(team_id)
+        if workspace is None:
+            workspace = self.factory(team_id)
+            self._workspaces[team_id] = workspace
+            logger.info(f"Loaded workspace {team_id} ({len(self._workspaces)} active)")
+        workspace.last_seen = now
+        return workspace
+
+    def evict_idle(self, now: Optional[float] = None) -> list[str]:
+        now = time.monotonic() if now is None else now
+        self._last_sweep = now
+        idle = [
+            team_id for team_id, workspace in self._workspaces.items()
+            if now - workspace.last_seen > self.idle_seconds and not workspace.inventory_lock.locked()
+        ]
+        evicted = []
+        for team_id in idle:
+            if not self._workspaces[team_id].channel_state.snapshot():
+                # Keep the workspace in memory rather than lose unsaved progress
+                continue
+            del self._workspaces[team_id]
+            evicted.append(team_id)
+            logger.info(f"Evicted idle workspace {team_id}")
+        return evicted
+
+    def snapshot_all(self) -> None:
+        for workspace in self._workspaces.values():
+            workspace.channel_state.snapshot()
+
+    def __len__(self) -> int:
+        return len(self._workspaces)